@@ -2,9 +2,11 @@
 Orchestrates the full ETL pipeline for Urban Traffic Data Lake.
 """
 
+import logging
 import os
-import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
+from scripts.minio_client import get_minio_client
 from scripts.generate_traffic_data import generate_traffic_data
 from scripts.generate_weather_data import generate_weather_data
 from scripts.copy_raw_to_bronze import copy_raw_to_bronze
@@ -16,23 +18,6 @@ from scripts.monte_carlo import monte_carlo_simulation
 from scripts.copy_to_hdfs import copy_to_hdfs
 
 
-def get_minio_client():
-    """Get MinIO client from environment variables"""
-    from minio import Minio
-
-    MINIO_URL = os.getenv("MINIO_URL", "http://minio:9002")
-    MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
-    MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin")
-
-    endpoint = MINIO_URL.replace("http://", "").replace("https://", "")
-    return Minio(
-        endpoint,
-        access_key=MINIO_ACCESS_KEY,
-        secret_key=MINIO_SECRET_KEY,
-        secure=False
-    )
-
-
 def run_pipeline():
     print("🚀 Starting Urban Traffic Data Lake ETL Pipeline")
     print("=" * 60)
@@ -40,45 +25,49 @@ def run_pipeline():
     try:
         # Step 1: Buckets are created by minio-init
         print("\n[1/10]  MinIO buckets ready (minio-init service)")
-        time.sleep(1)
+        client = get_minio_client()
 
-        # Step 2: Generate synthetic weather data
+        # Steps 2+3: Generate synthetic weather and traffic data (independent and
+        # CPU-bound, so each runs in its own process)
         print("\n[2/10]  Generating weather data...")
-        generate_weather_data()
-        time.sleep(1)
-
-        # Step 3: Generate synthetic traffic data
         print("[3/10]  Generating traffic data...")
-        generate_traffic_data()
-        time.sleep(1)
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            generators = [
+                executor.submit(generate_weather_data),
+                executor.submit(generate_traffic_data),
+            ]
+            for future in generators:
+                future.result()
 
         # Step 4: Copy raw data to MinIO Bronze
         print("\n[4/10]   Copying raw data to MinIO Bronze bucket...")
-        if not copy_raw_to_bronze():
+        if not copy_raw_to_bronze(client):
             print("[✖] Bronze copy failed, stopping pipeline")
             return False
-        time.sleep(2)
 
-        # Step 5: Clean traffic → Silver
+        # Steps 5+6: Clean traffic and weather → Silver (independent, run concurrently)
         print("\n[5/10]  Cleaning traffic data → Silver layer...")
-        client = get_minio_client()
-        if not clean_traffic(client):
+        print("[6/10]  Cleaning weather data → Silver layer...")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            # Both cleaners share the pipeline's one MinIO client: its urllib3 pool is
+            # thread-safe and hands each concurrent request its own pooled connection
+            traffic_future = executor.submit(clean_traffic, client)
+            weather_future = executor.submit(clean_weather, client)
+            traffic_ok = traffic_future.result()
+            weather_ok = weather_future.result()
+
+        if not traffic_ok:
             print("[✖] Traffic cleaning failed")
             return False
-
-        # Step 6: Clean weather → Silver
-        print("[6/10]  Cleaning weather data → Silver layer...")
-        if not clean_weather(client):
+        if not weather_ok:
             print("[✖] Weather cleaning failed")
             return False
-        time.sleep(2)
 
         # Step 7: Merge cleaned data
         print("\n[7/10]  Merging traffic + weather data...")
         if not merge_datasets(client):
             print("[✖] Merge failed")
             return False
-        time.sleep(2)
 
         # Step 8: Gold layer analytics – Factor Analysis
         print("\n[8/10]  Factor Analysis (Gold layer)...")
@@ -91,18 +80,17 @@ def run_pipeline():
         if not monte_carlo_simulation(client):
             print("[✖] Monte Carlo simulation failed")
             return False
-        time.sleep(1)
 
         # Step 10: Copy Silver layer to HDFS
         print("\n[10/10]   Copying Silver layer to HDFS...")
 
-        if not copy_to_hdfs():
+        if not copy_to_hdfs(client):
             print("[!!!!!!] HDFS copy warning (non-blocking)")
 
         print("\n" + "=" * 60)
         print(" ETL Pipeline COMPLETED SUCCESSFULLY!")
         print(" Data Lake Locations:")
-        print("    Bronze:   ./data/bronze/*.csv + MinIO bronze/")
+        print("    Bronze:   ./data/bronze/*.parquet + MinIO bronze/")
         print("    Silver:   ./data/silver/*.parquet + MinIO silver/")
         print("    Gold:     ./data/gold/*.parquet + MinIO gold/")
         print("    HDFS:    /silver/*.parquet")
@@ -122,5 +110,10 @@ def run_pipeline():
 
 
 if __name__ == "__main__":
+    # Per-file upload/copy detail is logged at DEBUG; LOG_LEVEL=DEBUG shows it
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO"),
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
     success = run_pipeline()
     exit(0 if success else 1)
@@ -0,0 +1,73 @@
+"""
+cleaning.py
+
+Shared helpers for the Bronze → Silver cleaners (clean_traffic, clean_weather).
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+def bronze_to_frame(table, column_types):
+    """
+    Convert a Bronze table to pandas with the cleaner's column types.
+
+    CSV-converted Bronze files hold every column as text. Text bound for a
+    numeric type stays a string through the Arrow cast and is coerced with
+    pd.to_numeric, so a dirty token becomes NaN instead of failing the cast.
+    """
+    fields = []
+    coerced = []
+    for field in table.schema:
+        target = column_types.get(field.name, pa.string())
+        is_text = pa.types.is_string(field.type) or pa.types.is_large_string(field.type)
+        if is_text and (pa.types.is_integer(target) or pa.types.is_floating(target)):
+            coerced.append(field.name)
+            target = pa.string()
+        fields.append((field.name, target))
+
+    # Hand Arrow buffers to pandas column by column, releasing them as they convert
+    df = table.cast(pa.schema(fields)).to_pandas(split_blocks=True, self_destruct=True)
+    for name in coerced:
+        df[name] = pd.to_numeric(df[name], errors="coerce").astype(
+            column_types[name].to_pandas_dtype()
+        )
+    return df
+
+
+# Timestamp layouts written by the data generators, tried in order with pandas'
+# compiled format parser before falling back to per-value inference
+DATE_TIME_FORMATS = ["%Y-%m-%d %H:%M", "%d/%m/%Y %I%p", "%Y-%m-%dT%H:%MZ"]
+
+
+def parse_date_time(values):
+    """
+    Parse raw date_time strings to naive UTC timestamps (NaT when invalid).
+
+    Every known layout is accepted row by row. A bare pd.to_datetime infers one
+    layout from the first value and coerces rows in the other layouts to NaT.
+    """
+    parsed = pd.to_datetime(values, format=DATE_TIME_FORMATS[0], errors="coerce")
+    for fmt in DATE_TIME_FORMATS[1:]:
+        missing = parsed.isna() & values.notna()
+        if not missing.any():
+            return parsed
+        parsed[missing] = pd.to_datetime(values[missing], format=fmt, errors="coerce")
+
+    # Slow path only for whatever no known format matched
+    missing = parsed.isna() & values.notna()
+    if missing.any():
+        parsed[missing] = pd.to_datetime(
+            values[missing], format="mixed", dayfirst=True, errors="coerce", utc=True
+        ).dt.tz_convert(None)
+    return parsed
+
+
+def categorical_mode(series):
+    """Most frequent category of a categorical column ("Unknown" if all missing)"""
+    # Count integer codes directly; ties resolve to the first category, like mode()
+    codes = series.cat.codes.to_numpy()
+    codes = codes[codes >= 0]
+    if codes.size == 0:
+        return "Unknown"
+    return series.cat.categories[np.bincount(codes).argmax()]
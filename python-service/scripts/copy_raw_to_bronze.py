@@ -1,49 +1,127 @@
 """
 copy_raw_to_bronze.py
 
-This script uploads raw CSV datasets from the local 'data/bronze' folder 
+This script uploads raw datasets from the local 'data/bronze' folder 
 to the 'bronze' bucket in MinIO. It uses the MinIO Python SDK to connect 
-to the MinIO server and transfer files.
+to the MinIO server and transfer files. The generators write Parquet,
+which is uploaded as-is; CSV files are converted to Snappy Parquet on the
+way (traffic_raw.csv → bronze/traffic_raw.parquet).
 
 Usage:
-    python copy_raw_to_bronze.py
+    python -m scripts.copy_raw_to_bronze
 """
 
+import csv
+import hashlib
+import logging
 import os
-from minio import Minio
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from minio.error import S3Error
-import time
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyarrow import csv as pacsv
 
-def get_minio_client():
-    """Get MinIO client using Docker Compose environment variables"""
-    MINIO_URL = os.getenv("MINIO_URL", "minio:9000")
-    MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
-    MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin")
-    
-    endpoint = MINIO_URL.replace("http://", "").replace("https://", "")
-    
-    return Minio(
-        endpoint,
-        access_key=MINIO_ACCESS_KEY,
-        secret_key=MINIO_SECRET_KEY,
-        secure=False
+from scripts.minio_client import get_minio_client
+from scripts.resilience import CircuitBreakerError, object_breaker, wait_for_minio
+
+BRONZE_BUCKET = "bronze"
+PART_SIZE = 64 * 1024 * 1024  # multipart chunk size for large raw files
+PARALLEL_PARTS = 4  # concurrent part uploads per multipart file
+CSV_BLOCK_SIZE = 64 * 1024 * 1024  # Arrow CSV parse block, one record batch each
+
+# Per-file messages are DEBUG so worker threads don't contend on stdout; LOG_LEVEL=DEBUG shows them
+logger = logging.getLogger("bronze")
+
+def file_md5(path, block_size=1024 * 1024):
+    """MD5 hex digest of a local file, read in 1 MiB blocks"""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def csv_to_parquet(csv_path, parquet_path):
+    """
+    Stream a raw CSV into a Snappy Parquet file one record batch at a time.
+    Every column is kept as text so Bronze stays raw; typing is left to the cleaners.
+    """
+    with open(csv_path, newline="") as f:
+        header = next(csv.reader(f))
+
+    reader = pacsv.open_csv(
+        csv_path,
+        read_options=pacsv.ReadOptions(block_size=CSV_BLOCK_SIZE, use_threads=True),
+        convert_options=pacsv.ConvertOptions(
+            column_types={name: pa.string() for name in header},
+            strings_can_be_null=True,  # empty / "NA" / "null" fields become nulls
+        ),
     )
+    with pq.ParquetWriter(parquet_path, reader.schema, compression="snappy") as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+
+def upload_file(client, entry, breaker):
+    """Upload one local file (os.DirEntry) to the bronze bucket, returning True on success"""
+    is_csv = entry.name.endswith(".csv")
+    object_name = entry.name[:-len(".csv")] + ".parquet" if is_csv else entry.name
+    try:
+        # Skip files already in MinIO with the same content. Converted CSVs carry the
+        # source file's MD5 as metadata; other files compare the ETag (== MD5 for
+        # single-part uploads)
+        source_md5 = file_md5(entry.path) if is_csv else None
+        try:
+            remote = client.stat_object(BRONZE_BUCKET, object_name)
+            if is_csv:
+                unchanged = remote.metadata.get("x-amz-meta-source-md5") == source_md5
+            else:
+                unchanged = remote.size == entry.stat().st_size and remote.etag == file_md5(entry.path)
+            if unchanged:
+                logger.debug("[i] %s unchanged in %s, skipped", entry.name, BRONZE_BUCKET)
+                return True
+        except S3Error:
+            pass  # Not uploaded yet
+        
+        # Routed through the breaker so a MinIO outage stops the remaining PUTs early
+        if is_csv:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                parquet_path = os.path.join(tmp_dir, object_name)
+                csv_to_parquet(entry.path, parquet_path)
+                breaker.call(
+                    client.fput_object,
+                    BRONZE_BUCKET,
+                    object_name,
+                    parquet_path,
+                    part_size=PART_SIZE,
+                    num_parallel_uploads=PARALLEL_PARTS,
+                    metadata={"x-amz-meta-source-md5": source_md5},
+                )
+        else:
+            breaker.call(
+                client.fput_object,
+                BRONZE_BUCKET,
+                object_name,  # Keep same filename in bucket
+                entry.path,
+                part_size=PART_SIZE,
+                num_parallel_uploads=PARALLEL_PARTS,
+            )
+        logger.debug("[✔] Uploaded %s → %s/%s", entry.name, BRONZE_BUCKET, object_name)
+        return True
+    except CircuitBreakerError:
+        print(f"[✖] Skipped {entry.name}: too many consecutive MinIO failures")
+        return False
+    except Exception as e:
+        print(f"[✖] Error uploading {entry.name}: {e}")
+        return False
 
-def copy_raw_to_bronze():
-    """Copy raw CSV files from local bronze folder to MinIO bronze bucket"""
-    BRONZE_BUCKET = "bronze"
+def copy_raw_to_bronze(client=None):
+    """Copy raw files from local bronze folder to MinIO bronze bucket (CSV as Parquet)"""
     LOCAL_BRONZE_DIR = "/app/data/bronze"  # Fixed path matching volume mount
     
     # Wait for MinIO to be ready
-    client = get_minio_client()
-    for _ in range(10):
-        try:
-            client.list_buckets()
-            break
-        except:
-            print("[i] Waiting for MinIO...")
-            time.sleep(2)
-    else:
+    if client is None:
+        client = get_minio_client()
+    if not wait_for_minio(client, bucket=BRONZE_BUCKET):
         print("[✖] MinIO not available")
         return False
     
@@ -52,31 +130,40 @@ def copy_raw_to_bronze():
         print(f"[✖] Local bronze directory not found: {LOCAL_BRONZE_DIR}")
         return False
     
-    files = [f for f in os.listdir(LOCAL_BRONZE_DIR) if os.path.isfile(os.path.join(LOCAL_BRONZE_DIR, f))]
+    with os.scandir(LOCAL_BRONZE_DIR) as it:
+        files = [entry for entry in it if entry.is_file()]
+    
+    # The generators write Parquet directly; a leftover CSV with the same name
+    # would map to the same object, so the Parquet file wins
+    local_names = {entry.name for entry in files}
+    superseded = {
+        entry.name for entry in files
+        if entry.name.endswith(".csv") and entry.name[:-len(".csv")] + ".parquet" in local_names
+    }
+    for name in sorted(superseded):
+        print(f"[i] {name} superseded by its Parquet file, skipped")
+    files = [entry for entry in files if entry.name not in superseded]
     if not files:
         print(f"[i] No files found in {LOCAL_BRONZE_DIR}")
         return True
     
-    print(f"[i] Found {len(files)} files to upload: {files}")
+    print(f"[i] Found {len(files)} files to upload")
+    logger.debug("[i] Files: %s", [entry.name for entry in files])
     
     # ---------------------- Upload Files ----------------------
-    success_count = 0
-    for filename in files:
-        local_path = os.path.join(LOCAL_BRONZE_DIR, filename)
-        try:
-            client.fput_object(
-                BRONZE_BUCKET,
-                filename,  # Keep same filename in bucket
-                local_path
-            )
-            print(f"[✔] Uploaded {filename} → {BRONZE_BUCKET}/{filename}")
-            success_count += 1
-        except S3Error as e:
-            print(f"[✖] Error uploading {filename}: {e}")
+    # Uploads are independent and network-bound, so run them concurrently
+    breaker = object_breaker("minio-bronze-upload")
+    with ThreadPoolExecutor(max_workers=min(8, len(files))) as executor:
+        results = executor.map(lambda entry: upload_file(client, entry, breaker), files)
+        success_count = sum(results)
     
     print(f"[✔] Upload completed: {success_count}/{len(files)} files successful")
     return success_count == len(files)
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO"),
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
     success = copy_raw_to_bronze()
     exit(0 if success else 1)
@@ -5,28 +5,32 @@ Copies cleaned Parquet files from MinIO Silver bucket to HDFS /silver directory
 using WebHDFS (NameNode HTTP port 9870).
 """
 
-from minio import Minio
 from minio.error import S3Error
 from hdfs import InsecureClient
-from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
 import os
-import time
+import posixpath
+import shutil
 import requests
+from requests.adapters import HTTPAdapter
 
+from scripts.minio_client import get_minio_client
+from scripts.resilience import (
+    CircuitBreakerError,
+    object_breaker,
+    wait_for_minio,
+    wait_until_ready,
+)
 
-def get_minio_client():
-    """Get MinIO client using Docker Compose environment variables"""
-    MINIO_URL = os.getenv("MINIO_URL", "http://minio:9002")
-    MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
-    MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin")
+# Silver Parquet row groups are sized to fit one HDFS block, so files are
+# written with the same block size to keep each row group in a single block
+HDFS_BLOCK_SIZE = 128 * 1024 * 1024
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+COPY_WORKERS = 8
 
-    endpoint = MINIO_URL.replace("http://", "").replace("https://", "")
-    return Minio(
-        endpoint,
-        access_key=MINIO_ACCESS_KEY,
-        secret_key=MINIO_SECRET_KEY,
-        secure=False
-    )
+# Per-file messages are DEBUG so copy workers don't contend on stdout; LOG_LEVEL=DEBUG shows them
+logger = logging.getLogger("hdfs")
 
 
 def get_hdfs_webhdfs_url():
@@ -46,9 +50,79 @@ def is_hdfs_ready(webhdfs_url: str) -> bool:
         return False
 
 
-def copy_to_hdfs():
+def is_copy_current(obj, hdfs_status):
+    """
+    True when the HDFS file already holds this MinIO object: same length and
+    written after the object was last modified. (HDFS file checksums are
+    CRC-based and not comparable with S3 ETags.)
+    """
+    if not hdfs_status:
+        return False
+    return (
+        hdfs_status["length"] == obj.size
+        and hdfs_status["modificationTime"] >= obj.last_modified.timestamp() * 1000
+    )
+
+
+def hdfs_file_index(hdfs_client, dest_dir, object_names):
+    """
+    Status of the files already under ``dest_dir``, keyed by path relative to
+    it (the object name), with one LISTSTATUS per directory the objects map to.
+    """
+    index = {}
+    for prefix in {posixpath.dirname(name) for name in object_names}:
+        try:
+            listing = hdfs_client.list(posixpath.normpath(posixpath.join(dest_dir, prefix)), status=True)
+        except Exception:
+            # Directory not created yet: nothing under it has been copied
+            continue
+        for name, status in listing:
+            index[posixpath.join(prefix, name)] = status
+    return index
+
+
+def stream_object_to_hdfs(minio_client, hdfs_client, bucket, obj_name, hdfs_path):
+    """Stream one MinIO object into an HDFS file, raising on any failure"""
+    response = minio_client.get_object(bucket, obj_name)
+    try:
+        # Byte-for-byte streaming copy of the Silver object, one chunk in memory at a time
+        with hdfs_client.write(
+            hdfs_path,
+            overwrite=True,
+            blocksize=HDFS_BLOCK_SIZE,
+            buffersize=COPY_CHUNK_SIZE,
+        ) as writer:
+            shutil.copyfileobj(response, writer, COPY_CHUNK_SIZE)
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def copy_object_to_hdfs(minio_client, hdfs_client, bucket, obj_name, hdfs_path, breaker):
+    """Copy one MinIO object to HDFS through the circuit breaker, returning True on success"""
+    try:
+        breaker.call(
+            stream_object_to_hdfs,
+            minio_client,
+            hdfs_client,
+            bucket,
+            obj_name,
+            hdfs_path,
+        )
+        logger.debug("!!!!! Copied %s → HDFS %s", obj_name, hdfs_path)
+        return True
+    except CircuitBreakerError:
+        print(f"✖ Skipped {obj_name}: too many consecutive copy failures")
+        return False
+    except Exception as e:
+        print(f"✖ Error copying {obj_name} to HDFS: {e}")
+        return False
+
+
+def copy_to_hdfs(minio_client=None):
     """
     Copy all .parquet files from MinIO 'silver' bucket to HDFS '/silver' directory.
+    Uses the given MinIO client (e.g. the pipeline's pooled client) or creates one.
     Returns True if all files copied successfully, False otherwise.
     """
     SILVER_BUCKET = "silver"
@@ -57,16 +131,10 @@ def copy_to_hdfs():
     print("[i] Connecting to MinIO and HDFS...")
 
     # ---------- MinIO client ----------
-    minio_client = get_minio_client()
+    if minio_client is None:
+        minio_client = get_minio_client()
     # Quick connectivity check with retry
-    for _ in range(10):
-        try:
-            minio_client.list_buckets()
-            break
-        except Exception:
-            print("[i] Waiting for MinIO...")
-            time.sleep(2)
-    else:
+    if not wait_for_minio(minio_client, bucket=SILVER_BUCKET):
         print("[✖] MinIO not available")
         return False
 
@@ -74,20 +142,22 @@ def copy_to_hdfs():
     webhdfs_url = get_hdfs_webhdfs_url()
     print(f"[i] Using WebHDFS endpoint: {webhdfs_url}")
 
-    max_retries = 30  # 30 * 5s = 150s = 2.5 minutes
-    for attempt in range(max_retries):
-        if is_hdfs_ready(webhdfs_url):
-            print(" HDFS NameNode WebHDFS is ready")
-            break
-        print(f"[i] Waiting for HDFS........ ({attempt + 1}/{max_retries})")
-        time.sleep(5)
+    # Up to 2.5 minutes for the NameNode to come up
+    if wait_until_ready(lambda: is_hdfs_ready(webhdfs_url), "HDFS", timeout=150):
+        print(" HDFS NameNode WebHDFS is ready")
     else:
         print("!!!!! HDFS not available via WebHDFS after retries")
         return False
 
     # Create HDFS client on WebHDFS URL
     HDFS_USER = os.getenv("HDFS_USER", "hadoop")
-    hdfs_client = InsecureClient(webhdfs_url, user=HDFS_USER)
+    # Keep-alive session with one pooled connection per copy worker, so concurrent
+    # WebHDFS requests (NameNode + DataNode redirects) reuse sockets
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=COPY_WORKERS)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    hdfs_client = InsecureClient(webhdfs_url, user=HDFS_USER, session=session)
 
     # Verify connection
     try:
@@ -107,41 +177,66 @@ def copy_to_hdfs():
         print(f"[i] HDFS directory check error (may already exist): {e}")
 
     # ---------- List Parquet files in MinIO silver bucket ----------
-    parquet_files = []
+    parquet_objects = []
     try:
-        for obj in minio_client.list_objects(SILVER_BUCKET):
+        # ListObjectsV2 pages are streamed lazily; recursive so nested Silver prefixes are included
+        for obj in minio_client.list_objects(SILVER_BUCKET, recursive=True, use_api_v1=False):
             if obj.object_name.endswith(".parquet"):
-                parquet_files.append(obj.object_name)
+                parquet_objects.append(obj)
     except S3Error as e:
         print(f"✖ Error listing Silver bucket: {e}")
         return False
 
+    parquet_files = [obj.object_name for obj in parquet_objects]
     if not parquet_files:
         print("[i] No .parquet files found in Silver bucket, nothing to copy")
         return True
 
     print(f"[i] Found {len(parquet_files)} parquet files: {parquet_files}")
 
-    # ---------- Copy each file ----------
-    success_count = 0
-    for obj_name in parquet_files:
-        try:
-            response = minio_client.get_object(SILVER_BUCKET, obj_name)
-            data_bytes = BytesIO(response.read()).getvalue()
+    # ---------- Skip files HDFS already has ----------
+    # One LISTSTATUS per destination directory instead of a status call per object
+    hdfs_index = hdfs_file_index(hdfs_client, HDFS_DEST_DIR, parquet_files)
 
-            hdfs_path = f"{HDFS_DEST_DIR}/{obj_name}"
-            with hdfs_client.write(hdfs_path, overwrite=True) as writer:
-                writer.write(data_bytes)
+    pending = []
+    for obj in parquet_objects:
+        if is_copy_current(obj, hdfs_index.get(obj.object_name)):
+            logger.debug("[i] %s unchanged in HDFS, skipped", obj.object_name)
+        else:
+            pending.append(obj.object_name)
 
-            print(f"!!!!! Copied {obj_name} → HDFS {hdfs_path}")
-            success_count += 1
-        except Exception as e:
-            print(f"✖ Error copying {obj_name} to HDFS: {e}")
+    if not pending:
+        print("!!!!! HDFS copy completed: all files already up to date")
+        return True
+
+    # ---------- Copy files concurrently ----------
+    # Each copy is a network round-trip on both sides, so overlap them
+    breaker = object_breaker("silver-to-hdfs-copy")
+    success_count = len(parquet_files) - len(pending)
+    with ThreadPoolExecutor(max_workers=min(COPY_WORKERS, len(pending))) as executor:
+        futures = {
+            executor.submit(
+                copy_object_to_hdfs,
+                minio_client,
+                hdfs_client,
+                SILVER_BUCKET,
+                obj_name,
+                f"{HDFS_DEST_DIR}/{obj_name}",
+                breaker,
+            ): obj_name
+            for obj_name in pending
+        }
+        for future in as_completed(futures):
+            success_count += future.result()
 
     print(f"!!!!! HDFS copy completed: {success_count}/{len(parquet_files)} files successful")
     return success_count == len(parquet_files)
 
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO"),
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
     ok = copy_to_hdfs()
     exit(0 if ok else 1)
@@ -1,25 +1,36 @@
-from minio import Minio
 from minio.error import S3Error
-import os
 
-MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "localhost:9000")
-MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
-MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin")
+from scripts.minio_client import get_minio_client
+from scripts.resilience import wait_for_minio
+
 BUCKETS = ["bronze", "silver", "gold"]
 
-client = Minio(
-    MINIO_ENDPOINT,
-    access_key=MINIO_ACCESS_KEY,
-    secret_key=MINIO_SECRET_KEY,
-    secure=False 
-)
 
-for bucket in BUCKETS:
-    try:
-        if not client.bucket_exists(bucket):
+def create_buckets(client=None):
+    """Create any missing data lake buckets, returning True if all exist afterwards"""
+    if client is None:
+        client = get_minio_client()
+    if not wait_for_minio(client):
+        print("[✖] MinIO not available")
+        return False
+
+    # One listing instead of a bucket_exists round-trip per bucket
+    existing = {bucket.name for bucket in client.list_buckets()}
+
+    ok = True
+    for bucket in BUCKETS:
+        if bucket in existing:
+            print(f"[i] Bucket already exists: {bucket}")
+            continue
+        try:
             client.make_bucket(bucket)
             print(f"[✔] Bucket created: {bucket}")
-        else:
-            print(f"[i] Bucket already exists: {bucket}")
-    except S3Error as e:
-        print(f"[✖] Error creating bucket {bucket}: {e}")
+        except S3Error as e:
+            print(f"[✖] Error creating bucket {bucket}: {e}")
+            ok = False
+    return ok
+
+
+if __name__ == "__main__":
+    success = create_buckets()
+    exit(0 if success else 1)
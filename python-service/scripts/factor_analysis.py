@@ -24,6 +24,7 @@ Key Outputs
 -----------
 - gold/traffic_weather_factors.parquet  → enriched dataset with factor scores
 - gold/factor_loadings.parquet          → variable-to-factor relationships
+- gold/impute_medians.parquet           → cached imputation medians / variance mask
 
 Intended Audience
 -----------------
@@ -36,56 +37,66 @@ Author
 Urban Traffic Data Lake Team
 """
 
+import hashlib
 import os
-import time
-from io import BytesIO
 
 import numpy as np
 import pandas as pd
-from minio import Minio
+import pyarrow as pa
+import pyarrow.parquet as pq
 from minio.error import S3Error
 from sklearn.decomposition import FactorAnalysis
 
+from scripts.minio_client import get_minio_client
+from scripts.resilience import wait_for_minio
+
 
 # -----------------------------------------------------------------------------
-# MinIO Client Utilities
+# Imputation Statistics Cache
 # -----------------------------------------------------------------------------
 
-def get_minio_client():
+def load_impute_stats(client, bucket, object_name, fingerprint):
     """
-    Create and return a MinIO client instance.
-
-    Environment Variables
-    ---------------------
-    MINIO_URL : str
-        MinIO service endpoint (default: minio:9000)
-    MINIO_ACCESS_KEY : str
-        Access key for authentication (default: minioadmin)
-    MINIO_SECRET_KEY : str
-        Secret key for authentication (default: minioadmin)
+    Fetch cached per-column medians and low-variance mask from MinIO.
 
     Returns
     -------
-    Minio
-        Configured MinIO client object.
-
-    Notes
-    -----
-    - HTTPS is disabled by default for local/dockerized environments.
-    - Endpoint normalization removes protocol prefixes if present.
+    tuple[np.ndarray, np.ndarray] or None
+        (medians, keep) when the cached object was built for ``fingerprint``,
+        None when it is missing or stale.
     """
+    try:
+        stat = client.stat_object(bucket, object_name)
+    except S3Error:
+        return None
+    if stat.metadata.get("x-amz-meta-fingerprint") != fingerprint:
+        return None
 
-    MINIO_URL = os.getenv("MINIO_URL", "minio:9000")
-    MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
-    MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin")
+    obj = client.get_object(bucket, object_name)
+    try:
+        stats = pq.read_table(pa.BufferReader(obj.read()))
+    finally:
+        obj.close()
+        obj.release_conn()
+    return (
+        stats.column("median").to_numpy().astype(np.float32),
+        stats.column("keep").to_numpy(zero_copy_only=False),
+    )
 
-    endpoint = MINIO_URL.replace("http://", "").replace("https://", "")
 
-    return Minio(
-        endpoint,
-        access_key=MINIO_ACCESS_KEY,
-        secret_key=MINIO_SECRET_KEY,
-        secure=False,
+def save_impute_stats(client, bucket, object_name, local_path, columns, medians, keep, fingerprint):
+    """Persist per-column medians and low-variance mask locally and to MinIO."""
+    stats = pa.table({
+        "column": pa.array(columns),
+        "median": pa.array(medians, type=pa.float32()),
+        "keep": pa.array(keep),
+    })
+    pq.write_table(stats, local_path, compression="zstd", compression_level=3)
+    client.fput_object(
+        bucket,
+        object_name,
+        local_path,
+        metadata={"x-amz-meta-fingerprint": fingerprint},
     )
 
 
@@ -129,8 +140,11 @@ def factor_analysis(client):
 
     MERGED_FILE = "merged_data.parquet"
     OUTPUT_FILE = "traffic_weather_factors.parquet"
+    LOADINGS_FILE = "factor_loadings.parquet"
+    MEDIANS_FILE = "impute_medians.parquet"
 
-    LOCAL_OUTPUT = "/app/data/gold/traffic_weather_factors.parquet"
+    LOCAL_GOLD_DIR = "/app/data/gold"
+    LOCAL_OUTPUT = os.path.join(LOCAL_GOLD_DIR, OUTPUT_FILE)
 
     try:
         # ------------------------------------------------------------------
@@ -138,16 +152,9 @@ def factor_analysis(client):
         # ------------------------------------------------------------------
         print(" [1/7] Connecting to MinIO...")
 
-        for i in range(20):
-            try:
-                client.list_buckets()
-                print(f"✔ MinIO ready ({i * 3}s)")
-                break
-            except Exception:
-                print(f"[i] MinIO wait {i + 1}/20...")
-                time.sleep(3)
-        else:
+        if not wait_for_minio(client, bucket=SILVER_BUCKET):
             return False
+        print("✔ MinIO ready")
 
         # ------------------------------------------------------------------
         # [2/7] Ensure Gold Bucket Exists
@@ -165,46 +172,85 @@ def factor_analysis(client):
         # ------------------------------------------------------------------
         print(f"\n [2/7] Loading {MERGED_FILE}...")
 
+        source_etag = client.stat_object(SILVER_BUCKET, MERGED_FILE).etag
         obj = client.get_object(SILVER_BUCKET, MERGED_FILE)
-        merged_df = pd.read_parquet(BytesIO(obj.read()))
+        try:
+            merged_table = pq.read_table(pa.BufferReader(obj.read()))
+        finally:
+            obj.close()
+            obj.release_conn()
 
-        print(f"✔ Loaded {len(merged_df):,} rows, {len(merged_df.columns)} columns")
+        print(f"✔ Loaded {merged_table.num_rows:,} rows, {merged_table.num_columns} columns")
 
         # ------------------------------------------------------------------
         # [4/7] Numeric Data Preparation
         # ------------------------------------------------------------------
         print("[i] [3/7] Preparing numeric data...")
 
-        numeric_cols = merged_df.select_dtypes(include=[np.number]).columns.tolist()
-        numeric_df = merged_df[numeric_cols]
-
-        # Handle missing values using median imputation
-        numeric_df = numeric_df.fillna(numeric_df.median())
-
-        # Remove near-constant features
-        numeric_df = numeric_df.loc[:, numeric_df.std() > 0.01]
-
-        print(f"✔ Using {len(numeric_df.columns)} numeric variables")
+        numeric_cols = [
+            field.name
+            for field in merged_table.schema
+            if pa.types.is_integer(field.type) or pa.types.is_floating(field.type)
+        ]
+
+        # Only the numeric columns go through pandas/NumPy, as one float32 matrix
+        # for imputation, variance filter and fitting (Silver measures are float32
+        # already; the ids are integers well inside float32's exact range)
+        X = merged_table.select(numeric_cols).to_pandas(
+            split_blocks=True, self_destruct=True
+        ).to_numpy(dtype=np.float32)
+
+        # Medians and the low-variance mask only depend on the merged object and
+        # its numeric columns, so reruns on the same Silver data reuse them
+        fingerprint = hashlib.md5("|".join([source_etag, *numeric_cols]).encode()).hexdigest()
+        cached_stats = load_impute_stats(client, GOLD_BUCKET, MEDIANS_FILE, fingerprint)
+        if cached_stats is not None:
+            medians, keep = cached_stats
+            print(f"✔ Reusing cached medians from gold/{MEDIANS_FILE}")
+        else:
+            medians = np.nanmedian(X, axis=0)
+
+        # Handle missing values using median imputation (in place)
+        nan_mask = np.isnan(X)
+        X[nan_mask] = np.take(medians, np.where(nan_mask)[1])
+
+        if cached_stats is None:
+            # Remove near-constant features (sample std, as pandas computes it)
+            keep = X.std(axis=0, ddof=1, dtype=np.float64) > 0.01
+            os.makedirs(LOCAL_GOLD_DIR, exist_ok=True)
+            save_impute_stats(
+                client,
+                GOLD_BUCKET,
+                MEDIANS_FILE,
+                os.path.join(LOCAL_GOLD_DIR, MEDIANS_FILE),
+                numeric_cols,
+                medians,
+                keep,
+                fingerprint,
+            )
+
+        X = np.ascontiguousarray(X[:, keep])
+        kept_cols = [col for col, k in zip(numeric_cols, keep) if k]
+
+        print(f"✔ Using {len(kept_cols)} numeric variables")
 
         # ------------------------------------------------------------------
         # [5/7] Factor Analysis Execution
         # ------------------------------------------------------------------
-        n_factors = min(5, len(numeric_df.columns) - 1)
+        n_factors = min(5, len(kept_cols) - 1)
         print(f"\n [4/7] Factor Analysis (n_factors={n_factors})...")
 
-        fa = FactorAnalysis(n_components=n_factors, random_state=42)
-        fa_result = fa.fit_transform(numeric_df)
-
-        # Factor scores per observation
-        fa_df = pd.DataFrame(
-            fa_result,
-            columns=[f"Factor_{i + 1}_score" for i in range(n_factors)],
-        )
+        # sklearn already defaults to randomized SVD inside the EM loop, but for a
+        # tall, narrow matrix (few variables) the exact thin SVD is cheaper per
+        # iteration; randomized only pays off once there are many variables
+        svd_method = "lapack" if X.shape[1] <= 50 else "randomized"
+        fa = FactorAnalysis(n_components=n_factors, svd_method=svd_method, random_state=42)
+        fa_result = fa.fit_transform(X)
 
         # Factor loadings per variable
         loadings = pd.DataFrame(
             fa.components_.T,
-            index=numeric_df.columns,
+            index=kept_cols,
             columns=[f"Factor_{i + 1}_loading" for i in range(n_factors)],
         ).round(4)
 
@@ -218,36 +264,50 @@ def factor_analysis(client):
         # ------------------------------------------------------------------
         # [6/7] Final Dataset Assembly
         # ------------------------------------------------------------------
-        final_df = pd.concat(
-            [merged_df.reset_index(drop=True), fa_df.reset_index(drop=True)],
-            axis=1,
-        )
+        # Factor scores per observation, appended to the merged columns in Arrow
+        # so the non-numeric columns are never converted to pandas
+        final_table = merged_table.replace_schema_metadata(None)
+        for i in range(n_factors):
+            final_table = final_table.append_column(
+                f"Factor_{i + 1}_score", pa.array(fa_result[:, i].astype(np.float32))
+            )
 
         # ------------------------------------------------------------------
         # [7/7] Persistence (Local + MinIO)
         # ------------------------------------------------------------------
         print("\n [5/7] Saving locally...")
 
-        os.makedirs("/app/data/gold", exist_ok=True)
-        final_df.to_parquet(LOCAL_OUTPUT, index=False)
-        loadings.to_parquet("/app/data/gold/factor_loadings.parquet")
+        # Scores and loadings go through the same Arrow writer; the loadings keep
+        # their variable-name index in the pandas metadata
+        gold_tables = {
+            OUTPUT_FILE: final_table,
+            LOADINGS_FILE: pa.Table.from_pandas(loadings),
+        }
+        os.makedirs(LOCAL_GOLD_DIR, exist_ok=True)
+        for file_name, table in gold_tables.items():
+            pq.write_table(
+                table,
+                os.path.join(LOCAL_GOLD_DIR, file_name),
+                compression="zstd",
+                compression_level=3,
+                use_dictionary=True,
+                data_page_size=1 << 20,
+            )
 
         print(f"✔ Saved locally: {LOCAL_OUTPUT}")
 
         print("\n [6/7] Uploading to MinIO...")
 
-        buffer = BytesIO()
-        final_df.to_parquet(buffer, index=False) 
-        buffer.seek(0)
-
-        client.put_object(
-            GOLD_BUCKET,
-            OUTPUT_FILE,
-            buffer,
-            buffer.getbuffer().nbytes,
-        )
-
-        print(f"✔ Uploaded: gold/{OUTPUT_FILE}")
+        # Stream the files just written from disk in 64 MiB parts instead of
+        # serializing a second copy into memory
+        for file_name in gold_tables:
+            client.fput_object(
+                GOLD_BUCKET,
+                file_name,
+                os.path.join(LOCAL_GOLD_DIR, file_name),
+                part_size=64 * 1024 * 1024,
+            )
+            print(f"✔ Uploaded: gold/{file_name}")
 
         print("\n FACTOR ANALYSIS COMPLETE!")
         print(f" {n_factors} factors are ready for downstream analytics & Jupyter notebooks")
@@ -1,105 +1,82 @@
 import pandas as pd
 import numpy as np
-from random import choice, randint, uniform
-from datetime import datetime, timedelta
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datetime import datetime
 import os
 
-def random_bad_datetime():
-    bad_formats = [
-        "TBD",
-        "2099-00-00 99:99",
-        "32/13/2025 25:61",
-        "Invalid",
-        None
-    ]
-    return choice(bad_formats)
-
-def random_good_datetime(base, i):
-    dt = base + timedelta(hours=i)
-    formats = [
-        dt.strftime("%Y-%m-%d %H:%M"),
-        dt.strftime("%d/%m/%Y %I%p"),
-        dt.strftime("%Y-%m-%dT%H:%MZ")
-    ]
-    return choice(formats)
-
-def generate_traffic_dataset(n=5000):
+from scripts.synthetic import disjoint_masks, random_date_times
+
+# One PCG64 generator per module, seeded from SEED so reruns reproduce the same data
+RNG = np.random.default_rng(int(os.getenv("SEED", "0")))
+
+# Unparseable or out-of-range timestamps injected into the raw feed
+BAD_DATE_TIMES = [
+    "TBD",
+    "2099-00-00 99:99",
+    "32/13/2025 25:61",
+    "Invalid",
+    None
+]
+
+def generate_traffic_dataset(n=5000, rng=RNG):
+    # All value columns are drawn as whole NumPy arrays; outliers and NULLs are
+    # spliced in with boolean masks (integer columns with NULLs become floats)
+
     # --- traffic_id ---
-    traffic_ids = list(range(9001, 9001 + n))
+    traffic_ids = np.arange(9001, 9001 + n, dtype=np.float64)
 
     # duplicates
-    for _ in range(15):
-        traffic_ids[randint(0, n - 1)] = choice(traffic_ids)
+    traffic_ids[rng.integers(0, n, 15)] = traffic_ids[rng.integers(0, n, 15)]
 
     # NULL IDs
-    for _ in range(8):
-        traffic_ids[randint(0, n - 1)] = None
+    traffic_ids[rng.integers(0, n, 8)] = np.nan
 
     # --- date_time ---
     base_date = datetime(2024, 1, 1)
-    date_times = []
-
-    for i in range(n):
-        if randint(1, 100) <= 7:  # 7% bad timestamps
-            date_times.append(random_bad_datetime())
-        else:
-            date_times.append(random_good_datetime(base_date, i))
+    date_times = random_date_times(rng, base_date, n, BAD_DATE_TIMES)
 
     # --- city ---
     cities = ["London", None]
-    city_values = [choice(cities) for _ in range(n)]
+    city_values = rng.choice(np.array(cities, dtype=object), size=n)
 
     # --- area ---
     areas = ["Camden", "Chelsea", "Islington", "Southwark", "Kensington", None]
-    area_values = [choice(areas) for _ in range(n)]
+    area_values = rng.choice(np.array(areas, dtype=object), size=n)
 
     # --- vehicle_count ---
-    vehicle_values = []
-    for _ in range(n):
-        if randint(1, 100) <= 5:  # 5% extreme outliers
-            vehicle_values.append(randint(10000, 25000))
-        elif randint(1, 100) <= 5:  # 5% NULL
-            vehicle_values.append(None)
-        else:
-            vehicle_values.append(randint(0, 5000))
+    mask_out, mask_null = disjoint_masks(rng, n, 0.05, 0.05)  # 5% extreme outliers, 5% of the rest NULL
+    vehicle_values = np.where(
+        mask_out, rng.integers(10000, 25001, n), rng.integers(0, 5001, n)
+    ).astype(np.float64)
+    vehicle_values[mask_null] = np.nan
 
     # --- avg_speed_kmh ---
-    speed_values = []
-    for _ in range(n):
-        if randint(1, 100) <= 5:
-            speed_values.append(uniform(-20, -1))  # invalid negative speeds
-        elif randint(1, 100) <= 5:
-            speed_values.append(None)
-        else:
-            speed_values.append(uniform(3, 120))
+    mask_out, mask_null = disjoint_masks(rng, n, 0.05, 0.05)  # invalid negative speeds
+    speed_values = np.where(mask_out, rng.uniform(-20, -1, n), rng.uniform(3, 120, n))
+    speed_values[mask_null] = np.nan
 
     # --- accident_count ---
-    accident_values = []
-    for _ in range(n):
-        if randint(1, 100) <= 2:  # rare outliers
-            accident_values.append(randint(20, 60))
-        elif randint(1, 100) <= 5:
-            accident_values.append(None)
-        else:
-            accident_values.append(randint(0, 10))
+    mask_out, mask_null = disjoint_masks(rng, n, 0.02, 0.05)  # rare outliers
+    accident_values = np.where(
+        mask_out, rng.integers(20, 61, n), rng.integers(0, 11, n)
+    ).astype(np.float64)
+    accident_values[mask_null] = np.nan
 
     # --- congestion_level ---
     congestion_levels = ["Low", "Medium", "High", None]
-    congestion_values = [choice(congestion_levels) for _ in range(n)]
+    congestion_values = rng.choice(np.array(congestion_levels, dtype=object), size=n)
 
     # --- road_condition ---
     road_conditions = ["Dry", "Wet", "Snowy", "Damaged", None]
-    road_values = [choice(road_conditions) for _ in range(n)]
+    road_values = rng.choice(np.array(road_conditions, dtype=object), size=n)
 
     # --- visibility_m ---
-    visibility_values = []
-    for _ in range(n):
-        if randint(1, 100) <= 5:
-            visibility_values.append(randint(20000, 50000))  # extreme
-        elif randint(1, 100) <= 5:
-            visibility_values.append(None)
-        else:
-            visibility_values.append(randint(50, 10000))
+    mask_out, mask_null = disjoint_masks(rng, n, 0.05, 0.05)  # extreme
+    visibility_values = np.where(
+        mask_out, rng.integers(20000, 50001, n), rng.integers(50, 10001, n)
+    ).astype(np.float64)
+    visibility_values[mask_null] = np.nan
 
     # -------- DataFrame --------
     df = pd.DataFrame({
@@ -114,6 +91,10 @@ def generate_traffic_dataset(n=5000):
         "road_condition": road_values,
         "visibility_m": visibility_values
     })
+
+    # Low-cardinality labels as categoricals (dictionary-encoded in Parquet)
+    label_cols = ["city", "area", "congestion_level", "road_condition"]
+    df[label_cols] = df[label_cols].astype("category")
     
     return df
 
@@ -122,13 +103,13 @@ def generate_traffic_data():
     # Local repo paths (matches your tree structure)
     bronze_path = "/app/data/bronze"
     os.makedirs(bronze_path, exist_ok=True)
-    output_file = os.path.join(bronze_path, "traffic_raw.csv")
+    output_file = os.path.join(bronze_path, "traffic_raw.parquet")
     
     # Generate dataset
     df = generate_traffic_dataset(n=5000)
     
-    # Save to bronze layer
-    df.to_csv(output_file, index=False)
+    # Save to bronze layer as Parquet: typed columns, no CSV text round-trip
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), output_file, compression="snappy")
     print(f"[✔] Synthetic traffic dataset generated → {output_file} ({len(df)} rows)")
 
 if __name__ == "__main__":
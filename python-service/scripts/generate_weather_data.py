@@ -1,149 +1,126 @@
 import pandas as pd
 import numpy as np
-from random import choice, randint, uniform
-from datetime import datetime, timedelta
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datetime import datetime
 import os
 
-def random_bad_datetime():
-    bad_formats = [
-        "Unknown",
-        "2099-13-40 25:61",
-        "32/15/2024 99:99",
-        "2024-01-15T99:00Z",
-        None
-    ]
-    return choice(bad_formats)
-
-def random_good_datetime(base, i):
-    dt = base + timedelta(hours=i)
-    formats = [
-        dt.strftime("%Y-%m-%d %H:%M"),
-        dt.strftime("%d/%m/%Y %I%p"),
-        dt.strftime("%Y-%m-%dT%H:%MZ")
-    ]
-    return choice(formats)
-
-def derive_season_from_date(dt_str):
-    """Sometimes returns None or wrong value for messy scenarios."""
-    if dt_str is None:
-        return None
-    try:
-        # try normal parsing
-        dt = pd.to_datetime(dt_str, errors="raise")
-        m = dt.month
-        if m in [12, 1, 2]:
-            return "Winter"
-        elif m in [3, 4, 5]:
-            return "Spring"
-        elif m in [6, 7, 8]:
-            return "Summer"
-        else:
-            return "Autumn"
-    except:
-        # invalid date -> random messy behaviour
-        return choice([None, "Winter", "FoggySeason"])
-
-def generate_weather_dataset(n=5000):
+from scripts.synthetic import disjoint_masks, random_date_times
+
+# One PCG64 generator per module, seeded from SEED so reruns reproduce the same data
+RNG = np.random.default_rng(int(os.getenv("SEED", "0")))
+
+# Unparseable or out-of-range timestamps injected into the raw feed
+BAD_DATE_TIMES = [
+    "Unknown",
+    "2099-13-40 25:61",
+    "32/15/2024 99:99",
+    "2024-01-15T99:00Z",
+    None
+]
+
+# Realistic (low, high) temperature range in °C per season
+SEASON_TEMPERATURE_RANGES = {
+    "Winter": (-5, 15),
+    "Spring": (5, 20),
+    "Summer": (10, 35),
+    "Autumn": (0, 20),
+}
+
+def derive_seasons_from_dates(rng, date_times):
+    """Seasons for a whole column of timestamps; sometimes None or wrong for messy scenarios."""
+    # One mixed-layout parse for the column (utc=True lets naive and "Z" values mix)
+    dt = pd.to_datetime(pd.Series(date_times), format="mixed", errors="coerce", utc=True)
+    months = dt.dt.month.to_numpy()
+    seasons = np.select(
+        [
+            np.isin(months, [12, 1, 2]),
+            np.isin(months, [3, 4, 5]),
+            np.isin(months, [6, 7, 8]),
+            np.isin(months, [9, 10, 11]),
+        ],
+        ["Winter", "Spring", "Summer", "Autumn"],
+        default=None,
+    ).astype(object)
+
+    # invalid date -> random messy behaviour (missing dates stay None)
+    invalid = dt.isna().to_numpy() & ~pd.isna(date_times)
+    seasons[invalid] = rng.choice(
+        np.array([None, "Winter", "FoggySeason"], dtype=object), size=int(invalid.sum())
+    )
+    return seasons
+
+def generate_weather_dataset(n=5000, rng=RNG):
+    # All value columns are drawn as whole NumPy arrays; outliers and NULLs are
+    # spliced in with boolean masks
+
     # --- weather_id ---
-    weather_ids = list(range(5001, 5001 + n))
+    weather_ids = np.arange(5001, 5001 + n, dtype=np.float64)
 
     # duplicates
-    for _ in range(20):
-        weather_ids[randint(0, n - 1)] = choice(weather_ids)
+    weather_ids[rng.integers(0, n, 20)] = weather_ids[rng.integers(0, n, 20)]
 
     # NULL IDs
-    for _ in range(10):
-        weather_ids[randint(0, n - 1)] = None
+    weather_ids[rng.integers(0, n, 10)] = np.nan
 
     # --- date_time ---
     base_date = datetime(2024, 1, 1)
-    date_times = []
-
-    for i in range(n):
-        if randint(1, 100) <= 7:  # 7% bad timestamps
-            date_times.append(random_bad_datetime())
-        else:
-            date_times.append(random_good_datetime(base_date, i))
+    date_times = random_date_times(rng, base_date, n, BAD_DATE_TIMES)
 
     # --- city ---
     cities = ["London", None]
-    city_values = [choice(cities) for _ in range(n)]
+    city_values = rng.choice(np.array(cities, dtype=object), size=n)
 
     # --- season (derived) but messy ---
-    seasons = [derive_season_from_date(dt) for dt in date_times]
+    seasons = derive_seasons_from_dates(rng, date_times)
 
     # --- temperature_c ---
-    temperature_values = []
-    for s in seasons:
-        if randint(1, 100) <= 5:  # 5% NULL
-            temperature_values.append(None)
-            continue
-
-        # seasonal realistic ranges
-        if s == "Winter":
-            temp = uniform(-5, 15)
-        elif s == "Spring":
-            temp = uniform(5, 20)
-        elif s == "Summer":
-            temp = uniform(10, 35)
-        elif s == "Autumn":
-            temp = uniform(0, 20)
-        else:
-            temp = uniform(-5, 35)
-
-        # 3% outliers
-        if randint(1, 100) <= 3:
-            temp = choice([-30, 60])
-
-        temperature_values.append(temp)
+    # Seasonal realistic ranges; missing or messy seasons use the full range
+    cats = pd.Categorical(seasons, categories=list(SEASON_TEMPERATURE_RANGES))
+    lo, hi = np.array(list(SEASON_TEMPERATURE_RANGES.values()), dtype=np.float64).T
+    codes = cats.codes
+    temperature_values = rng.uniform(
+        np.where(codes >= 0, lo[codes], -5), np.where(codes >= 0, hi[codes], 35)
+    )
+
+    # 3% outliers
+    mask_out = rng.random(n) < 0.03
+    temperature_values[mask_out] = rng.choice([-30, 60], size=int(mask_out.sum()))
+
+    # 5% NULL
+    temperature_values[rng.random(n) < 0.05] = np.nan
 
     # --- humidity ---
-    humidity_values = []
-    for _ in range(n):
-        if randint(1, 100) <= 5:
-            humidity_values.append(None)
-        else:
-            h = randint(20, 100)
-            if randint(1, 100) <= 3:  # messy
-                h = choice([-10, 150])
-            humidity_values.append(h)
+    mask_null, mask_messy = disjoint_masks(rng, n, 0.05, 0.03)
+    humidity_values = np.where(
+        mask_messy,
+        rng.choice([-10, 150], size=n),
+        rng.integers(20, 101, n),
+    ).astype(np.float64)
+    humidity_values[mask_null] = np.nan
 
     # --- rain_mm ---
-    rain_values = []
-    for _ in range(n):
-        if randint(1, 100) <= 5:
-            rain_values.append(None)
-        else:
-            r = uniform(0, 50)
-            if randint(1, 100) <= 3:
-                r = uniform(120, 200)  # extreme
-            rain_values.append(r)
+    mask_null, mask_out = disjoint_masks(rng, n, 0.05, 0.03)  # extreme
+    rain_values = np.where(mask_out, rng.uniform(120, 200, n), rng.uniform(0, 50, n))
+    rain_values[mask_null] = np.nan
 
     # --- wind_speed_kmh ---
-    wind_values = []
-    for _ in range(n):
-        if randint(1, 100) <= 5:
-            wind_values.append(None)
-        else:
-            w = uniform(0, 80)
-            if randint(1, 100) <= 3:
-                w = uniform(200, 300)
-            wind_values.append(w)
+    mask_null, mask_out = disjoint_masks(rng, n, 0.05, 0.03)
+    wind_values = np.where(mask_out, rng.uniform(200, 300, n), rng.uniform(0, 80, n))
+    wind_values[mask_null] = np.nan
 
     # --- visibility_m ---
-    visibility_values = []
-    for _ in range(n):
-        if randint(1, 100) <= 5:
-            visibility_values.append(None)
-        else:
-            v = randint(50, 10000)
-            if randint(1, 100) <= 3:
-                v = choice([50000, "Unknown", "NaN", "xxx"])  # messy strings
-            visibility_values.append(v)
+    # Text column: numbers mixed with messy strings, as in the raw feed
+    mask_null, mask_messy = disjoint_masks(rng, n, 0.05, 0.03)
+    visibility_values = rng.integers(50, 10001, n).astype(str).astype(object)
+    visibility_values[mask_messy] = rng.choice(
+        np.array(["50000", "Unknown", "NaN", "xxx"], dtype=object), size=int(mask_messy.sum())
+    )
+    visibility_values[mask_null] = None
 
     # --- weather_condition ---
     weather_conditions = ["Clear", "Rain", "Fog", "Storm", "Snow", None]
-    condition_values = [choice(weather_conditions) for _ in range(n)]
+    condition_values = rng.choice(np.array(weather_conditions, dtype=object), size=n)
 
     # -------- DataFrame --------
     df = pd.DataFrame({
@@ -158,6 +135,10 @@ def generate_weather_dataset(n=5000):
         "visibility_m": visibility_values,
         "weather_condition": condition_values
     })
+
+    # Low-cardinality labels as categoricals (dictionary-encoded in Parquet)
+    label_cols = ["city", "season", "weather_condition"]
+    df[label_cols] = df[label_cols].astype("category")
     
     return df
 
@@ -166,13 +147,13 @@ def generate_weather_data():
     # Local repo paths (matches your tree structure)
     bronze_path = "/app/data/bronze"
     os.makedirs(bronze_path, exist_ok=True)
-    output_file = os.path.join(bronze_path, "weather_raw.csv")
+    output_file = os.path.join(bronze_path, "weather_raw.parquet")
     
     # Generate dataset
     df = generate_weather_dataset(n=5000)
     
-    # Save to bronze layer
-    df.to_csv(output_file, index=False)
+    # Save to bronze layer as Parquet: typed columns, no CSV text round-trip
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), output_file, compression="snappy")
     print(f"[✔] Synthetic weather dataset generated → {output_file} ({len(df)} rows)")
 
 if __name__ == "__main__":
@@ -5,27 +5,31 @@ Merge cleaned traffic and weather datasets from MinIO Silver bucket.
 Save merged dataset locally and back to MinIO Silver bucket.
 """
 
+import numpy as np
 import pandas as pd
-from minio import Minio
+import pyarrow as pa
+import pyarrow.parquet as pq
 from minio.error import S3Error
-from io import BytesIO
 import os
-import time
 
-def get_minio_client():
-    """Get MinIO client using Docker Compose environment variables"""
-    MINIO_URL = os.getenv("MINIO_URL", "minio:9000")
-    MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
-    MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin")
-    
-    endpoint = MINIO_URL.replace("http://", "").replace("https://", "")
-    
-    return Minio(
-        endpoint,
-        access_key=MINIO_ACCESS_KEY,
-        secret_key=MINIO_SECRET_KEY,
-        secure=False
-    )
+from scripts.minio_client import get_minio_client
+from scripts.resilience import wait_for_minio
+
+def read_silver_table(client, bucket, object_name):
+    """Read a Parquet object into an Arrow table straight from the response bytes"""
+    obj = client.get_object(bucket, object_name)
+    try:
+        return pq.read_table(pa.BufferReader(obj.read()))
+    finally:
+        obj.close()
+        obj.release_conn()
+
+def day_number(values):
+    """Calendar day of each timestamp as int32 days since the epoch (NaT -> int32 min)"""
+    days = pd.to_datetime(values, errors='coerce').to_numpy().astype('datetime64[D]').view('int64')
+    return np.where(
+        days == np.iinfo(np.int64).min, np.iinfo(np.int32).min, days
+    ).astype(np.int32)
 
 def merge_datasets(client):
     # ---------------- Configuration ----------------
@@ -35,65 +39,66 @@ def merge_datasets(client):
     
     try:
         # Wait for MinIO
-        for _ in range(10):
-            try:
-                client.list_buckets()
-                break
-            except:
-                print("[i] Waiting for MinIO...")
-                time.sleep(2)
-        else:
+        if not wait_for_minio(client, bucket=SILVER_BUCKET):
             print("[✖] MinIO not available")
             return False
         
         # ---------------- Read cleaned traffic ----------------
         print("[i] Loading traffic_clean.parquet...")
-        traffic_data_obj = client.get_object(SILVER_BUCKET, "traffic_clean.parquet")
-        with BytesIO(traffic_data_obj.read()) as f:
-            df_traffic = pd.read_parquet(f)
+        df_traffic = read_silver_table(client, SILVER_BUCKET, "traffic_clean.parquet").to_pandas()
         print(f"[✔] Traffic data loaded: {len(df_traffic)} rows")
         
         # ---------------- Read cleaned weather ----------------
         print("[i] Loading weather_clean.parquet...")
-        weather_data_obj = client.get_object(SILVER_BUCKET, "weather_clean.parquet")
-        with BytesIO(weather_data_obj.read()) as f:
-            df_weather = pd.read_parquet(f)
+        df_weather = read_silver_table(client, SILVER_BUCKET, "weather_clean.parquet").to_pandas()
         print(f"[✔] Weather data loaded: {len(df_weather)} rows")
         
         # ---------------- Merge datasets ----------------
         print("[i] Merging datasets on city and date...")
         
-        # Create date_only columns for merging
-        df_traffic['date_only'] = pd.to_datetime(df_traffic['date_time'], errors='coerce').dt.date
-        df_weather['date_only'] = pd.to_datetime(df_weather['date_time'], errors='coerce').dt.date
+        # Give both city keys the same categories so the join compares integer codes
+        cities = pd.api.types.union_categoricals(
+            [df_traffic['city'].astype('category'), df_weather['city'].astype('category')]
+        ).categories
+        df_traffic['city'] = pd.Categorical(df_traffic['city'], categories=cities)
+        df_weather['city'] = pd.Categorical(df_weather['city'], categories=cities)
+        
+        # Day keys for merging: int32 day numbers hash far faster than datetime.date objects
+        df_traffic['day_i32'] = day_number(df_traffic['date_time'])
+        df_weather['day_i32'] = day_number(df_weather['date_time'])
         
-        # Merge on city and date_only (left join keeps all traffic records)
-        df_merged = pd.merge(
-            df_traffic,
-            df_weather,
+        # Left join on city and day (keeps all traffic records). Weather is indexed by
+        # the key once so the join probes that index; a day has several weather
+        # readings, so the key is not unique and every match is kept, as before
+        weather_by_day = df_weather.set_index(['city', 'day_i32'])
+        df_merged = df_traffic.join(
+            weather_by_day,
+            on=['city', 'day_i32'],
             how='left',
-            on=['city', 'date_only'],
-            suffixes=('_traffic', '_weather')
+            lsuffix='_traffic',
+            rsuffix='_weather'
         )
         
-        df_merged.drop(columns=['date_only'], inplace=True)
+        df_merged.drop(columns=['day_i32'], inplace=True)
         print(f"[✔] Merged dataset created: {len(df_merged)} rows")
         
-        # ---------------- Save locally ----------------
+        # ---------------- Save locally (pyarrow + Snappy) ----------------
         silver_path = os.path.dirname(LOCAL_OUTPUT)
         os.makedirs(silver_path, exist_ok=True)
-        df_merged.to_parquet(LOCAL_OUTPUT, index=False, engine='fastparquet')
+        pq.write_table(
+            pa.Table.from_pandas(df_merged, preserve_index=False),
+            LOCAL_OUTPUT,
+            compression='snappy',
+            use_dictionary=True
+        )
         print(f"[✔] Merged dataset saved locally → {LOCAL_OUTPUT}")
         
-        # ---------------- Save to MinIO ----------------
-        buffer = BytesIO()
-        df_merged.to_parquet(buffer, index=False, engine='fastparquet')
-        buffer.seek(0)
-        client.put_object(
+        # ---------------- Save to MinIO (streamed from the local file) ----------------
+        client.fput_object(
             SILVER_BUCKET,
             MINIO_OBJECT_NAME,
-            buffer,
-            length=buffer.getbuffer().nbytes
+            LOCAL_OUTPUT,
+            content_type='application/octet-stream'
         )
         print(f"[✔] Merged dataset uploaded → MinIO {SILVER_BUCKET}/{MINIO_OBJECT_NAME}")
         
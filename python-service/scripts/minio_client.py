@@ -0,0 +1,69 @@
+"""
+minio_client.py
+
+Shared MinIO client for the pipeline scripts.
+
+One client is created lazily per process and backed by a single urllib3
+keep-alive pool, so every step and every worker thread reuses the same TCP
+connections instead of each script opening its own pool. Steps that only need
+a few columns of a Parquet object use the matching pyarrow S3 filesystem for
+ranged reads instead.
+"""
+
+import functools
+import os
+
+import urllib3
+from minio import Minio
+from pyarrow import fs
+
+# Pooled connections per host: concurrent Bronze uploads x parallel parts,
+# the two cleaners and the HDFS copy workers, with headroom
+POOL_MAXSIZE = 64
+
+
+@functools.lru_cache(maxsize=1)
+def get_minio_client():
+    """Get the process-wide MinIO client using Docker Compose environment variables"""
+    MINIO_URL = os.getenv("MINIO_URL", "http://minio:9002")
+    MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
+    MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin")
+
+    http_client = urllib3.PoolManager(
+        num_pools=4,
+        maxsize=POOL_MAXSIZE,
+        block=False,
+        retries=urllib3.Retry(
+            total=5,
+            backoff_factor=0.2,
+            status_forcelist=[500, 502, 503, 504],
+        ),
+    )
+
+    endpoint = MINIO_URL.replace("http://", "").replace("https://", "")
+    return Minio(
+        endpoint,
+        access_key=MINIO_ACCESS_KEY,
+        secret_key=MINIO_SECRET_KEY,
+        secure=False,
+        http_client=http_client,
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def get_s3_filesystem():
+    """Get the process-wide pyarrow S3 filesystem for the same MinIO endpoint"""
+    MINIO_URL = os.getenv("MINIO_URL", "http://minio:9002")
+    MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
+    MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin")
+
+    endpoint = MINIO_URL.replace("http://", "").replace("https://", "")
+    return fs.S3FileSystem(
+        access_key=MINIO_ACCESS_KEY,
+        secret_key=MINIO_SECRET_KEY,
+        endpoint_override=endpoint,
+        scheme="http",
+        # MinIO's default region; avoids a region lookup per bucket
+        region="us-east-1",
+        retry_strategy=fs.AwsStandardS3RetryStrategy(max_attempts=5),
+    )
@@ -0,0 +1,73 @@
+"""
+resilience.py
+
+Shared retry and circuit-breaker helpers for the pipeline's MinIO and HDFS calls.
+
+- Readiness checks back off exponentially with jitter (bounded by a total
+  timeout) instead of polling on a fixed sleep.
+- Per-object loops (uploads, HDFS copies) go through a circuit breaker, so a
+  dependency that is clearly down fails the remaining objects fast instead of
+  being retried once per file.
+"""
+
+import pybreaker
+from tenacity import (
+    Retrying,
+    retry_if_exception_type,
+    retry_if_result,
+    stop_after_delay,
+    wait_exponential_jitter,
+)
+
+# Consecutive failures before a breaker opens, and seconds before it lets one call probe again
+BREAKER_FAIL_MAX = 5
+BREAKER_RESET_TIMEOUT = 30
+
+CircuitBreakerError = pybreaker.CircuitBreakerError
+
+
+def wait_until_ready(check, name, timeout=60):
+    """
+    Call check() until it returns a truthy value, backing off exponentially with jitter.
+
+    Args:
+        check: zero-argument callable; exceptions count as "not ready yet"
+        name: service name used in progress messages
+        timeout: total seconds to keep trying
+
+    Returns:
+        bool: True once check() succeeded, False if the timeout ran out
+    """
+    retryer = Retrying(
+        stop=stop_after_delay(timeout),
+        wait=wait_exponential_jitter(initial=1, max=10),
+        retry=retry_if_exception_type(Exception) | retry_if_result(lambda ready: not ready),
+        before_sleep=lambda state: print(f"[i] Waiting for {name}... (attempt {state.attempt_number})"),
+        retry_error_callback=lambda state: False,
+    )
+    return bool(retryer(check))
+
+
+def wait_for_minio(client, timeout=60, bucket=None):
+    """
+    Block until the MinIO server answers, False if it never does.
+
+    With ``bucket`` each probe is a single bucket_exists() HEAD request, which
+    also waits for that bucket to be created; without one it lists all buckets.
+    """
+    def ping():
+        if bucket is not None:
+            return client.bucket_exists(bucket)
+        client.list_buckets()
+        return True
+
+    return wait_until_ready(ping, "MinIO", timeout)
+
+
+def object_breaker(name):
+    """Circuit breaker for a loop of independent object operations against one service"""
+    return pybreaker.CircuitBreaker(
+        fail_max=BREAKER_FAIL_MAX,
+        reset_timeout=BREAKER_RESET_TIMEOUT,
+        name=name,
+    )
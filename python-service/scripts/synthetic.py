@@ -0,0 +1,28 @@
+"""
+synthetic.py
+
+Shared helpers for the synthetic Bronze data generators
+(generate_traffic_data, generate_weather_data).
+"""
+
+import numpy as np
+import pandas as pd
+
+# Valid timestamp layouts, mixed at random per row
+GOOD_DATE_TIME_FORMATS = ["%Y-%m-%d %H:%M", "%d/%m/%Y %I%p", "%Y-%m-%dT%H:%MZ"]
+
+
+def random_date_times(rng, base, n, bad_values):
+    """Hourly timestamps from base in a random layout each, with 7% drawn from bad_values"""
+    hours = pd.date_range(base, periods=n, freq="h")
+    layouts = [hours.strftime(fmt).to_numpy(dtype=object) for fmt in GOOD_DATE_TIME_FORMATS]
+    good = np.choose(rng.integers(0, len(layouts), n), layouts)
+    bad = rng.choice(np.array(bad_values, dtype=object), size=n)
+    return np.where(rng.random(n) < 0.07, bad, good)
+
+
+def disjoint_masks(rng, n, p_first, p_second):
+    """Two disjoint row masks from one uniform draw: p_first of all rows, then p_second of the rest"""
+    u = rng.random(n)
+    first = u < p_first
+    return first, ~first & (u < p_first + (1 - p_first) * p_second)
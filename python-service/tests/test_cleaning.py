@@ -0,0 +1,32 @@
+import math
+import unittest
+
+import numpy as np
+import pyarrow as pa
+
+from scripts.clean_traffic import BRONZE_COLUMN_TYPES
+from scripts.cleaning import bronze_to_frame
+
+
+class BronzeToFrameTest(unittest.TestCase):
+    def test_bad_numeric_token_becomes_nan(self):
+        table = pa.table({
+            "traffic_id": pa.array(["9001.0", "9002.0", "9003.0"]),
+            "vehicle_count": pa.array(["120.0", "abc", None]),
+            "city": pa.array(["London", None, "London"]),
+        })
+        df = bronze_to_frame(table, BRONZE_COLUMN_TYPES)
+        self.assertEqual(df["vehicle_count"].dtype, np.float32)
+        self.assertEqual(df["vehicle_count"].iloc[0], 120.0)
+        self.assertTrue(math.isnan(df["vehicle_count"].iloc[1]))
+        self.assertTrue(math.isnan(df["vehicle_count"].iloc[2]))
+        self.assertEqual(df["traffic_id"].dtype, np.float64)
+
+    def test_typed_bronze_columns_are_cast(self):
+        table = pa.table({"vehicle_count": pa.array([1.0, None], type=pa.float64())})
+        df = bronze_to_frame(table, BRONZE_COLUMN_TYPES)
+        self.assertEqual(df["vehicle_count"].dtype, np.float32)
+
+
+if __name__ == "__main__":
+    unittest.main()
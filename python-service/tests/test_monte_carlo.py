@@ -0,0 +1,34 @@
+import unittest
+
+from scripts.monte_carlo import define_weather_scenarios, simulate_scenario_impact
+
+
+class SimulateScenarioImpactTest(unittest.TestCase):
+    def test_zero_baseline_traffic(self):
+        for name, config in define_weather_scenarios().items():
+            result = simulate_scenario_impact(name, config, 0.0, 0.0)
+            self.assertEqual(result["mean_traffic"], 0.0)
+            self.assertEqual(result["traffic_std"], 0.0)
+            self.assertEqual(result["congestion_prob_high"], 0.0)
+
+    def test_zero_spread_above_threshold(self):
+        config = define_weather_scenarios()["sunny"]
+        result = simulate_scenario_impact("sunny", config, 0.0, -1.0)
+        self.assertEqual(result["congestion_prob_high"], 100.0)
+
+    def test_negative_baseline_is_a_step_not_the_complement(self):
+        config = define_weather_scenarios()["rainy"]
+        below = simulate_scenario_impact("rainy", config, -100.0, 0.0)
+        self.assertEqual(below["congestion_prob_high"], 0.0)
+        above = simulate_scenario_impact("rainy", config, -100.0, -1000.0)
+        self.assertEqual(above["congestion_prob_high"], 100.0)
+
+    def test_congestion_probability_matches_normal_model(self):
+        config = {"traffic_mult": 1.0, "accident_factor": 1.0, "description": "baseline"}
+        # mean equal to the threshold: half of N(mu, sigma) lies above it
+        result = simulate_scenario_impact("custom", config, 100.0, 100.0)
+        self.assertEqual(result["congestion_prob_high"], 50.0)
+
+
+if __name__ == "__main__":
+    unittest.main()